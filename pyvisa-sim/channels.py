@@ -11,16 +11,18 @@
 from __future__ import absolute_import
 from collections import defaultdict
 
-import stringparser
-
 from .common import logger
-from .component import Component, Property, to_bytes
+from .component import (Component, Property, to_bytes, DIALOGUE,
+                        InvalidValue)
 
 
 class ChannelProperty(Property):
     """A channel property storing the value for all channels.
 
     """
+
+    __slots__ = ('_channel',)
+
     def __init__(self, channel, name, default_value, specs):
 
         #: Refrence to the channel holding that property.
@@ -41,12 +43,25 @@ class ChannelProperty(Property):
         """
         return self._value[self._channel._selected]
 
+    def format_value(self, field):
+        """Format the current value for a channel.
+
+        The value depends on the selected channel so it is not cached.
+        """
+        return field.format(self.get_value()).encode('utf-8')
+
     def set_value(self, string_value):
         """Set the current value for a channel.
 
+        :return: False if the value does not match the specs, True otherwise.
+        :rtype: bool
         """
-        value = self.validate_value(string_value)
+        value = self._validate(string_value)
+        if value is InvalidValue:
+            return False
         self._value[self._channel._selected] = value
+        self._changed()
+        return True
 
 
 class ChDict(dict):
@@ -87,9 +102,7 @@ class Channels(Component):
         #: Ids of the activated channels.
         self._ids = ids
 
-        self._getters = ChDict(__default__={})
-
-        self._dialogues = ChDict(__default__={})
+        self._exact = ChDict(__default__={})
 
     def add_dialogue(self, query, response):
         """Add dialogue to channel.
@@ -97,7 +110,8 @@ class Channels(Component):
         :param query: query string
         :param response: response string
         """
-        self._dialogues['__default__'][to_bytes(query)] = to_bytes(response)
+        self._exact['__default__'][to_bytes(query)] = (DIALOGUE,
+                                                       to_bytes(response))
 
     def add_property(self, name, default_value, getter_pair, setter_triplet,
                      specs):
@@ -113,15 +127,10 @@ class Channels(Component):
                                                  default_value, specs)
 
         if getter_pair:
-            query, response = getter_pair
-            self._getters['__default__'][to_bytes(query)] = name, response
+            self._add_getter(self._exact['__default__'], name, *getter_pair)
 
         if setter_triplet:
-            query, response, error = setter_triplet
-            self._setters.append((name,
-                                  stringparser.Parser(query),
-                                  to_bytes(response),
-                                  to_bytes(error)))
+            self._add_setter(name, *setter_triplet)
 
     def match(self, query):
         """Try to find a match for a query in the channel commands.
@@ -134,27 +143,14 @@ class Channels(Component):
             else:
                 return
 
-            response = self._match_dialog(query,
-                                          self._dialogues['__default__'])
-            if response is not None:
-                return response
-
-            response = self._match_getters(query,
-                                           self._getters['__default__'])
+            response = self._match_exact(query, self._exact['__default__'])
             if response is not None:
                 return response
 
         else:
             for ch_id in self._ids:
                 self._selected = ch_id
-                response = self._match_dialog(query,
-                                              self._dialogues[ch_id])
-                if response is not None:
-                    return response
-
-                response = self._match_getters(query,
-                                               self._getters[ch_id])
-
+                response = self._match_exact(query, self._exact[ch_id])
                 if response is not None:
                     return response
 
@@ -163,24 +159,29 @@ class Channels(Component):
     def _match_setters(self, query):
         """Try to find a match
         """
-        q = query.decode('utf-8')
-        for name, parser, response, error_response in self._setters:
-            try:
-                parsed = parser(q)
-                logger.debug('Found response in setter of %s' % name)
-            except ValueError:
+        # Only decode once a setter prefix matched.
+        q = None
+        for i in self._iter_setters(query):
+            if q is None:
+                q = query.decode('utf-8')
+            parsed = self._parse_setter(i, q)
+            if parsed is None:
                 continue
 
-            try:
-                if isinstance(parsed, dict) and 'ch_id' in parsed:
-                    self._selected = parsed['ch_id']
-                    self._properties[name].set_value(parsed['0'])
-                else:
-                    self._properties[name].set_value(parsed)
-                return response
-            except ValueError:
-                if isinstance(error_response, bytes):
-                    return error_response
-                return self._device.error_response('command_error')
+            name = self._setter_names[i]
+            logger.debug('Found response in setter of %s', name)
+
+            if isinstance(parsed, dict) and 'ch_id' in parsed:
+                self._selected = parsed['ch_id']
+                is_set = self._properties[name].set_value(parsed['0'])
+            else:
+                is_set = self._properties[name].set_value(parsed)
+            if is_set:
+                return self._setter_responses[i]
+
+            error_response = self._setter_errors[i]
+            if isinstance(error_response, bytes):
+                return error_response
+            return self._device.error_response('command_error')
 
         return None
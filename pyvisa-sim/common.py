@@ -3,8 +3,8 @@
     pyvisa-sim.common
     ~~~~~~~~~~~~~~~~~
 
-    This code is currently taken from PyVISA-py.
-    Do not edit here.
+    This code was originally taken from PyVISA-py. iter_bytes has since
+    diverged from it and is maintained here.
 
     :copyright: 2014 by PyVISA-sim Authors, see AUTHORS for more details.
     :license: MIT, see LICENSE for more details.
@@ -17,6 +17,8 @@ import logging
 
 from pyvisa import logger
 
+from .compat import lru_cache
+
 logger = logging.LoggerAdapter(logger, {'backend': 'py'})
 
 
@@ -34,26 +36,38 @@ class NamedObject(object):
 
 
 if sys.version >= '3':
+    #: One byte long bytes objects indexed by their value.
+    _BYTE_SINGLETONS = tuple(bytes([i]) for i in range(256))
+
+    @lru_cache(maxsize=None)
+    def _mask_table(mask):
+        return bytes(i & ~mask & 0xff for i in range(256))
+
     def iter_bytes(data, mask, send_end):
-        for d in data[:-1]:
-            yield bytes([d & ~mask])
+        out = bytes(data).translate(_mask_table(mask))
 
         if send_end:
-            yield bytes([data[-1] | ~mask])
-        else:
-            yield bytes([data[-1] & ~mask])
+            out = out[:-1] + _BYTE_SINGLETONS[data[-1] | mask]
+
+        for d in out:
+            yield _BYTE_SINGLETONS[d]
 
     int_to_byte = lambda val: bytes([val])
     last_int = lambda val: val[-1]
 else:
+    @lru_cache(maxsize=None)
+    def _mask_table(mask):
+        return ''.join(chr(i & ~mask & 0xff) for i in range(256))
+
     def iter_bytes(data, mask, send_end):
-        for d in data[:-1]:
-            yield chr(ord(d) & ~mask)
+        out = data.translate(_mask_table(mask))
 
         if send_end:
-            yield chr(ord(data[-1]) | ~mask)
-        else:
-            yield chr(ord(data[-1]) & ~mask)
+            out = out[:-1] + chr(ord(data[-1]) | mask)
+
+        # Iterating over a str already yields shared one character strings.
+        for c in out:
+            yield c
 
     int_to_byte = chr
     last_int = lambda val: ord(val[-1])
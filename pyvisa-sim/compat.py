@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""
+    pyvisa-sim.compat
+    ~~~~~~~~~~~~~~~~~
+
+    Compatibility layer between Python 2 and 3.
+
+    :copyright: 2014 by PyVISA-sim Authors, see AUTHORS for more details.
+    :license: MIT, see LICENSE for more details.
+"""
+
+from __future__ import absolute_import
+
+try:
+    from functools import lru_cache
+except ImportError:
+    from functools import wraps
+
+    # Python 2 has no lru_cache, fall back to a plain unbounded memoizer.
+    def lru_cache(maxsize=128):
+        def decorator(func):
+            cache = {}
+
+            @wraps(func)
+            def wrapper(arg):
+                try:
+                    return cache[arg]
+                except KeyError:
+                    result = cache[arg] = func(arg)
+                    return result
+
+            return wrapper
+        return decorator
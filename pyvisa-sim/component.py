@@ -9,9 +9,24 @@
     :license: MIT, see LICENSE for more details.
 """
 from __future__ import absolute_import
+import re
+from string import Formatter
+
 import stringparser
 
 from .common import logger
+from .compat import lru_cache
+
+# Sentinel used for when there should not be a response to a query
+NoResponse = object()
+
+# Sentinel returned when a value does not match the specs of a Property
+InvalidValue = object()
+
+#: Escaped sequences found in text messages and their unescaped value.
+_ESC = {'\\r': '\r', '\\n': '\n'}
+
+_ESC_RE = re.compile('|'.join(map(re.escape, _ESC)))
 
 
 def to_bytes(val):
@@ -19,23 +34,155 @@ def to_bytes(val):
     """
     if val is NoResponse:
         return val
-    val = val.replace('\\r', '\r').replace('\\n', '\n')
-    return val.encode()
+    return _to_bytes_str(val)
 
 
-# Sentinel used for when there should not be a response to a query
-NoResponse = object()
+@lru_cache(maxsize=4096)
+def _to_bytes_str(val):
+    """Unescape and encode a text message.
+
+    The same few strings (terminations, OK/ERROR responses) are converted
+    over and over while loading devices so the result is cached.
+    """
+    # Most messages contain no escaped sequence at all.
+    if '\\' not in val:
+        return val.encode()
+    return _ESC_RE.sub(lambda m: _ESC[m.group(0)], val).encode()
+
+
+@lru_cache(maxsize=2048)
+def _get_parser(query):
+    """Return the string parser of a setter query.
+
+    Parsers hold no state between calls so they are shared by all the
+    components defining the same query, including across reloads of the
+    same definition file.
+    """
+    return stringparser.Parser(query)
+
+
+def split_response_template(response):
+    """Split a getter response template around its replacement field.
+
+    The literal text surrounding the field is encoded once so that only the
+    formatted value needs to be encoded when answering a query. Templates
+    not made of exactly one replacement field, including malformed ones, are
+    returned unsplit so that errors only show up when the getter is queried.
+
+    :param response: response template (PEP 3101 format string)
+    :type response: str | NoResponse
+    :return: (literal prefix, replacement field, literal suffix)
+    :rtype: (bytes, str, bytes) | NoResponse
+    """
+    if response is NoResponse:
+        return response
+
+    try:
+        parsed = list(Formatter().parse(response))
+    except ValueError:
+        return b'', response, b''
+
+    if (not parsed or parsed[0][1] is None or
+            any(field is not None for _, field, _, _ in parsed[1:])):
+        return b'', response, b''
+
+    prefix, field, spec, conversion = parsed[0]
+    if conversion:
+        field += '!' + conversion
+    if spec:
+        field += ':' + spec
+    suffix = ''.join(literal for literal, _, _, _ in parsed[1:])
+
+    return prefix.encode('utf-8'), '{' + field + '}', suffix.encode('utf-8')
+
+
+# Kinds of the entries of the exact queries table of a component.
+DIALOGUE = 0
+GETTER = 1
+
+# Flags describing the constraints found in the specs of a Property.
+_HAS_MIN = 1
+_HAS_MAX = 2
+_HAS_VALID = 4
+
+
+def _make_validator(specs):
+    """Build a function validating a value against the specs of a Property.
+
+    The function is specialized for the constraints present in the specs so
+    that validating a value does not have to inspect the specs again.
+
+    :param specs: specification dictionary (already normalized)
+    :return: callable converting a value and returning InvalidValue if invalid
+    """
+    t = specs.get('type')
+    if t:
+        # Values parsed by the setters usually already have the right type.
+        def convert(value):
+            if type(value) is t:
+                return value
+            try:
+                return t(value)
+            except ValueError:
+                return InvalidValue
+    else:
+        def convert(value):
+            return value
+
+    low = specs.get('min')
+    high = specs.get('max')
+    valid = specs.get('valid')
+
+    flags = ((_HAS_MIN if 'min' in specs else 0) |
+             (_HAS_MAX if 'max' in specs else 0) |
+             (_HAS_VALID if 'valid' in specs else 0))
+
+    if not flags:
+        return convert
+
+    if flags == _HAS_VALID:
+        def validate(value):
+            value = convert(value)
+            if value not in valid:
+                return InvalidValue
+            return value
+
+    elif flags == _HAS_MIN | _HAS_MAX:
+        def validate(value):
+            value = convert(value)
+            if value is InvalidValue or value < low or value > high:
+                return InvalidValue
+            return value
+
+    else:
+        def validate(value):
+            value = convert(value)
+            if value is InvalidValue:
+                return value
+            if flags & _HAS_MIN and value < low:
+                return InvalidValue
+            if flags & _HAS_MAX and value > high:
+                return InvalidValue
+            if flags & _HAS_VALID and value not in valid:
+                return InvalidValue
+            return value
+
+    return validate
 
 
 class Property(object):
     """A device property
     """
 
-    def __init__(self, name, value, specs):
+    __slots__ = ('name', 'specs', '_value', '_formatted', '_validate',
+                 '_owner')
+
+    def __init__(self, name, value, specs, owner=None):
         """
         :param name: name of the property
         :param value: default value
         :param specs: specification dictionary
+        :param owner: component notified when the value changes
         :return:
         """
 
@@ -51,18 +198,35 @@ class Property(object):
                 specs[key] = t(specs[key])
 
         if 'valid' in specs:
-            specs['valid'] = set([t(val) for val in specs['valid']])
+            specs['valid'] = frozenset(t(val) for val in specs['valid'])
 
         self.name = name
         self.specs = specs
         self._value = None
+
+        #: Validator specialized for the specs.
+        #: :type: (object) -> object
+        self._validate = _make_validator(specs)
+
+        #: Encoded value for each replacement field it was formatted with.
+        #: Cleared whenever the value changes.
+        #: :type: dict[str, bytes]
+        self._formatted = {}
+
+        #: Component whose properties version is incremented whenever the
+        #: value changes.
+        #: :type: Component | None
+        self._owner = owner
+
         self.init_value(value)
 
     def init_value(self, string_value):
         """Initialize the value hold by the Property.
 
+        :raises ValueError: if the value does not match the specs.
         """
-        self.set_value(string_value)
+        if not self.set_value(string_value):
+            raise ValueError
 
     def get_value(self):
         """Return the value stored by the Property.
@@ -70,25 +234,45 @@ class Property(object):
         """
         return self._value
 
+    def format_value(self, field):
+        """Return the value formatted using a replacement field as bytes.
+
+        """
+        try:
+            return self._formatted[field]
+        except KeyError:
+            formatted = field.format(self.get_value()).encode('utf-8')
+            self._formatted[field] = formatted
+            return formatted
+
     def set_value(self, string_value):
         """Set the value
+
+        :return: False if the value does not match the specs, True otherwise.
+        :rtype: bool
+        """
+        value = self._validate(string_value)
+        if value is InvalidValue:
+            return False
+        self._value = value
+        self._changed()
+        return True
+
+    def _changed(self):
+        """Invalidate the cached representations of the value.
+
         """
-        self._value = self.validate_value(string_value)
+        self._formatted.clear()
+        if self._owner is not None:
+            self._owner._properties_version += 1
 
     def validate_value(self, string_value):
         """Validate that a value match the Property specs.
 
+        :raises ValueError: if the value does not match the specs.
         """
-        specs = self.specs
-        if 'type' in specs:
-            value = specs['type'](string_value)
-        else:
-            value = string_value
-        if 'min' in specs and value < specs['min']:
-            raise ValueError
-        if 'max' in specs and value > specs['max']:
-            raise ValueError
-        if 'valid' in specs and value not in specs['valid']:
+        value = self._validate(string_value)
+        if value is InvalidValue:
             raise ValueError
         return value
 
@@ -100,24 +284,46 @@ class Component(object):
 
     def __init__(self):
 
-        #: Stores the queries accepted by the device.
-        #: query: response
-        #: :type: dict[bytes, bytes]
-        self._dialogues = {}
+        #: Stores the dialogues and getter queries accepted by the device.
+        #: query: (DIALOGUE, response) or
+        #:        (GETTER, (property_name, (response prefix, field,
+        #:                                  response suffix)))
+        #: :type: dict[bytes, (int, bytes | (str, (bytes, str, bytes)))]
+        self._exact = {}
 
         #: Maps property names to value, type, validator
         #: :type: dict[str, Property]
         self._properties = {}
 
-        #: Stores the getter queries accepted by the device.
-        #: query: (property_name, response)
-        #: :type: dict[bytes, (str, str)]
-        self._getters = {}
+        #: Incremented whenever the value of one of the properties changes.
+        #: :type: int
+        self._properties_version = 0
+
+        #: Stores the setters queries accepted by the device, one list per
+        #: field indexed by setter.
+        #: :type: list[str]
+        self._setter_names = []
+
+        #: String parser of the setter query.
+        #: :type: list[stringparser.Parser]
+        self._setter_parsers = []
 
-        #: Stores the setters queries accepted by the device.
-        #: (property_name, string parser query, response, error response)
-        #: :type: list[(str, stringparser.Parser, bytes, bytes)]
-        self._setters = []
+        #: Response to the setter query.
+        #: :type: list[bytes]
+        self._setter_responses = []
+
+        #: Error response to the setter query.
+        #: :type: list[bytes]
+        self._setter_errors = []
+
+        #: Setters indexes grouped by the literal text preceding the first
+        #: replacement field of their query.
+        #: :type: dict[bytes, list[int]]
+        self._setters = {}
+
+        #: Prefixes of the setters queries.
+        #: :type: tuple[bytes]
+        self._setter_prefixes = ()
 
     def add_dialogue(self, query, response):
         """Add dialogue to device.
@@ -125,7 +331,7 @@ class Component(object):
         :param query: query string
         :param response: response string
         """
-        self._dialogues[to_bytes(query)] = to_bytes(response)
+        self._exact[to_bytes(query)] = DIALOGUE, to_bytes(response)
 
     def add_property(self, name, default_value, getter_pair, setter_triplet,
                      specs):
@@ -137,18 +343,55 @@ class Component(object):
         :param setter_triplet: (query, response, error)
         :param specs: specification of the Property
         """
-        self._properties[name] = Property(name, default_value, specs)
+        self._properties[name] = Property(name, default_value, specs, self)
 
         if getter_pair:
-            query, response = getter_pair
-            self._getters[to_bytes(query)] = name, response
+            self._add_getter(self._exact, name, *getter_pair)
 
         if setter_triplet:
-            query, response, error = setter_triplet
-            self._setters.append((name,
-                                  stringparser.Parser(query),
-                                  to_bytes(response),
-                                  to_bytes(error)))
+            self._add_setter(name, *setter_triplet)
+
+    def _add_getter(self, exact, name, query, response):
+        """Add a getter query to an exact queries table.
+
+        :param exact: table in which to store the getter
+        :param name: property name
+        :param query: query string
+        :param response: response template string
+        """
+        query = to_bytes(query)
+
+        # Dialogues take precedence over getters sharing the same query.
+        entry = exact.get(query)
+        if entry is None or entry[0] != DIALOGUE:
+            exact[query] = GETTER, (name, split_response_template(response))
+
+    def _add_setter(self, name, query, response, error):
+        """Add a setter query to the setters bucket matching its prefix.
+
+        :param name: property name
+        :param query: setter query (PEP 3101 format string)
+        :param response: response string
+        :param error: error response string
+        """
+        # Unescaped literal text matched before the first replacement field.
+        prefix = ''
+        for literal, field, _, _ in Formatter().parse(query):
+            prefix += literal
+            if field is not None:
+                break
+        prefix = prefix.encode('utf-8')
+
+        if prefix not in self._setters:
+            self._setters[prefix] = []
+            self._setter_prefixes = tuple(self._setters)
+
+        self._setters[prefix].append(len(self._setter_names))
+
+        self._setter_names.append(name)
+        self._setter_parsers.append(_get_parser(query))
+        self._setter_responses.append(to_bytes(response))
+        self._setter_errors.append(to_bytes(error))
 
     def match(self, query):
         """Try to find a match for a query in the instrument commands.
@@ -156,40 +399,63 @@ class Component(object):
         """
         raise NotImplementedError()
 
-    def _match_dialog(self, query, dialogues=None):
-        """Tries to match in dialogues
+    def _match_exact(self, query, exact=None):
+        """Tries to match in dialogues and getters
 
         :param query: message tuple
         :type query: Tuple[bytes]
         :return: response if found or None
         :rtype: Tuple[bytes] | None
         """
-        if dialogues is None:
-            dialogues = self._dialogues
+        if exact is None:
+            exact = self._exact
+
+        entry = exact.get(query)
+        if entry is None:
+            return None
 
-        # Try to match in the queries
-        if query in dialogues:
-            response = dialogues[query]
-            logger.debug('Found response in queries: %s' % repr(response))
+        kind, payload = entry
+        if kind == DIALOGUE:
+            logger.debug('Found response in queries: %r', payload)
+            return payload
 
-            return response
+        name, (prefix, field, suffix) = payload
+        logger.debug('Found response in getter of %s', name)
+        value = self._properties[name].format_value(field)
+        return prefix + value + suffix
 
-    def _match_getters(self, query, getters=None):
-        """Tries to match in getters
+    def _iter_setters(self, query):
+        """Return the indexes of the setters whose literal prefix starts the
+        query, in the order in which the setters were added.
 
         :param query: message tuple
         :type query: Tuple[bytes]
-        :return: response if found or None
-        :rtype: Tuple[bytes] | None
+        :rtype: list[int]
         """
-        if getters is None:
-            getters = self._getters
+        prefixes = self._setter_prefixes
 
-        if query in getters:
-            name, response = getters[query]
-            logger.debug('Found response in getter of %s' % name)
-            response = response.format(self._properties[name].get_value())
-            return response.encode('utf-8')
+        # Reject messages matching no prefix in a single call.
+        if not query.startswith(prefixes):
+            return []
+
+        # Several prefixes may match, the first setter defined wins.
+        return sorted(index for prefix in prefixes if query.startswith(prefix)
+                      for index in self._setters[prefix])
+
+    def _parse_setter(self, index, q):
+        """Parse a message using a setter query.
+
+        :param index: index of the setter
+        :param q: decoded message
+        :type q: str
+        :return: parsed value or None if the message does not match
+        """
+        # Messages reaching this point already start with the literal prefix
+        # of the setter so they rarely fail to parse.
+        try:
+            return self._setter_parsers[index](q)
+        except ValueError:
+            return None
 
     def _match_setters(self, query):
         """Tries to match in setters
@@ -199,20 +465,24 @@ class Component(object):
         :return: response if found or None
         :rtype: Tuple[bytes] | None
         """
-        q = query.decode('utf-8')
-        for name, parser, response, error_response in self._setters:
-            try:
-                value = parser(q)
-                logger.debug('Found response in setter of %s' % name)
-            except ValueError:
+        # Only decode once a setter prefix matched.
+        q = None
+        for i in self._iter_setters(query):
+            if q is None:
+                q = query.decode('utf-8')
+            value = self._parse_setter(i, q)
+            if value is None:
                 continue
 
-            try:
-                self._properties[name].set_value(value)
-                return response
-            except ValueError:
-                if isinstance(error_response, bytes):
-                    return error_response
-                return self.error_response('command_error')
+            name = self._setter_names[i]
+            logger.debug('Found response in setter of %s', name)
+
+            if self._properties[name].set_value(value):
+                return self._setter_responses[i]
+
+            error_response = self._setter_errors[i]
+            if isinstance(error_response, bytes):
+                return error_response
+            return self.error_response('command_error')
 
         return None
@@ -130,6 +130,21 @@ class Device(Component):
         #: :type: dict
         self._error_queues = {}
 
+        #: Matching methods tried in order by _match, restricted to the
+        #: non empty tables. Built on the first match and reset whenever
+        #: queries are added to the device.
+        #: :type: tuple[(bytes) -> bytes | None]
+        self._matchers = None
+
+        #: Responses already given to dialogues and getters queries.
+        #: Cleared when the value of a property or a query changes.
+        #: :type: dict[bytes, bytes]
+        self._responses = {}
+
+        #: Properties version when the responses were cached.
+        #: :type: int
+        self._responses_version = self._properties_version
+
     @property
     def resource_name(self):
         """Assigned resource name
@@ -153,6 +168,32 @@ class Device(Component):
 
         """
         self._channels[ch_name] = ch_obj
+        self._matchers = None
+
+    def add_dialogue(self, query, response):
+        """Add dialogue to device.
+
+        :param query: query string
+        :param response: response string
+        """
+        super(Device, self).add_dialogue(query, response)
+        self._responses.clear()
+        self._matchers = None
+
+    def add_property(self, name, default_value, getter_pair, setter_triplet,
+                     specs):
+        """Add property to device
+
+        :param name: property name
+        :param default_value: default value as string
+        :param getter_pair: (query, response)
+        :param setter_triplet: (query, response, error)
+        :param specs: specification of the Property
+        """
+        super(Device, self).add_property(name, default_value, getter_pair,
+                                         setter_triplet, specs)
+        self._responses.clear()
+        self._matchers = None
 
     def add_error_handler(self, error_input):
         """Add error handler to the device
@@ -189,6 +230,8 @@ class Device(Component):
         for key, value in response_dict.items():
             self._error_response[key] = to_bytes(value)
 
+        self._matchers = None
+
     def error_response(self, error_key):
         if error_key in self._error_map:
             self._error_map[error_key].set(error_key)
@@ -218,7 +261,7 @@ class Device(Component):
         :param data: single element byte
         :type data: bytes
         """
-        logger.debug('Writing into device input buffer: %r' % data)
+        logger.debug('Writing into device input buffer: %r', data)
         if not isinstance(data, bytes):
             raise TypeError('data must be an instance of bytes')
 
@@ -268,31 +311,67 @@ class Device(Component):
         :return: response if found or None
         :rtype: Tuple[bytes] | None
         """
-        response = self._match_dialog(query)
-        if response is not None:
-            return response
+        matchers = self._matchers
+        if matchers is None:
+            matchers = self._matchers = self._build_matchers()
 
-        response = self._match_getters(query)
-        if response is not None:
-            return response
+        for matcher in matchers:
+            response = matcher(query)
+            if response is not None:
+                return response
 
-        response = self._match_registers(query)
-        if response is not None:
-            return response
+        return None
+
+    def _build_matchers(self):
+        """Collect the matching methods required by the device definition.
+
+        Stages without any registered query are left out so that unmatched
+        messages do not go through them.
 
-        response = self._match_errors_queues(query)
+        :rtype: tuple[(bytes) -> bytes | None]
+        """
+        stages = ((self._exact, self._match_cached),
+                  (self._status_registers, self._match_registers),
+                  (self._error_queues, self._match_errors_queues),
+                  (self._setter_names, self._match_setters),
+                  (self._channels, self._match_channels))
+
+        return tuple(matcher for table, matcher in stages if table)
+
+    def _match_cached(self, query):
+        """Tries to match in dialogues and getters, reusing the response
+        given to a previous identical query when possible.
+
+        :param query: message tuple
+        :type query: Tuple[bytes]
+        :return: response if found or None
+        :rtype: Tuple[bytes] | None
+        """
+        if self._responses_version != self._properties_version:
+            self._responses.clear()
+            self._responses_version = self._properties_version
+
+        response = self._responses.get(query)
         if response is not None:
             return response
 
-        response = self._match_setters(query)
+        response = self._match_exact(query)
         if response is not None:
-            return response
+            self._responses[query] = response
+        return response
 
-        if response is None:
-            for channel in self._channels.values():
-                response = channel.match(query)
-                if response:
-                    return response
+    def _match_channels(self, query):
+        """Tries to match in channels
+
+        :param query: message tuple
+        :type query: Tuple[bytes]
+        :return: response if found or None
+        :rtype: Tuple[bytes] | None
+        """
+        for channel in self._channels.values():
+            response = channel.match(query)
+            if response:
+                return response
 
         return None
 
@@ -307,8 +386,7 @@ class Device(Component):
         if query in self._status_registers:
             register = self._status_registers[query]
             response = register.value
-            logger.debug('Found response in status register: %s',
-                         repr(response))
+            logger.debug('Found response in status register: %r', response)
             register.clear()
 
             return response
@@ -324,8 +402,7 @@ class Device(Component):
         if query in self._error_queues:
             queue = self._error_queues[query]
             response = queue.value
-            logger.debug('Found response in error queue: %s',
-                         repr(response))
+            logger.debug('Found response in error queue: %r', response)
 
             return response
 
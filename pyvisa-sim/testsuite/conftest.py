@@ -17,3 +17,11 @@ def channels():
     rm = pyvisa.ResourceManager(path + '@sim')
     yield rm
     rm.close()
+
+
+@pytest.fixture
+def matching():
+    path = os.path.join(os.path.dirname(__file__), 'fixtures', 'matching.yaml')
+    rm = pyvisa.ResourceManager(path + '@sim')
+    yield rm
+    rm.close()
@@ -3,6 +3,7 @@
 from __future__ import absolute_import
 
 import pytest
+from pyvisa import constants
 from pyvisa.errors import VisaIOError
 
 
@@ -156,3 +157,26 @@ def test_instrument_for_error_state(resource, resource_manager):
 
     inst.write(":VOLT:IMM:AMPL 0")
     assert_instrument_response(inst, ":SYST:ERR?", '1, Command error')
+
+
+def test_serial_last_bit_termination(resource_manager):
+    inst = resource_manager.open_resource('ASRL1::INSTR', read_termination='\n')
+    inst.set_visa_attribute(constants.VI_ATTR_ASRL_END_OUT,
+                            constants.SerialTermination.last_bit)
+    inst.set_visa_attribute(constants.VI_ATTR_ASRL_DATA_BITS, 8)
+    device = resource_manager.visalib.sessions[inst.session].device
+
+    # The last data bit is cleared from every byte sent.
+    inst.set_visa_attribute(constants.VI_ATTR_SEND_END_EN, False)
+    inst.write_raw(bytes(bytearray(c | 0x80 for c in bytearray(b'?IDN\r\n'))))
+    assert inst.read() == 'LSG Serial #1234'
+
+    # With send end, it is set on the last byte to mark the end of message.
+    inst.set_visa_attribute(constants.VI_ATTR_SEND_END_EN, True)
+    try:
+        inst.write_raw(b'?IDN')
+        assert device._input_buffer == bytearray(b'?ID\xce')
+    finally:
+        device._input_buffer = bytearray()
+
+    inst.close()
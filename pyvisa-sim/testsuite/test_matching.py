@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+from __future__ import absolute_import
+
+import pytest
+
+
+def assert_instrument_response(device, query, data):
+    response = device.query(query)
+    assert response == data, '%s, %r == %r' % (device.resource_name, query, data)
+
+
+RESOURCES = [
+    'ASRL1::INSTR',
+    'GPIB0::8::INSTR',
+    'TCPIP0::localhost:1111::inst0::INSTR',
+    'USB0::0x1111::0x2222::0x1234::0::INSTR',
+]
+
+
+def open_instrument(rm, resource):
+    return rm.open_resource(resource, read_termination='\n',
+                            write_termination='\r\n' if resource.startswith('ASRL') else '\n')
+
+
+@pytest.mark.parametrize('resource', RESOURCES)
+def test_getter_templates(resource, matching):
+    inst = open_instrument(matching, resource)
+
+    assert_instrument_response(inst, '?IDN', 'MATCHING MOCK')
+    assert_instrument_response(inst, 'Q?', "V='abc' {ok}")
+    assert_instrument_response(inst, 'B?', "{'abc'}")
+    assert_instrument_response(inst, 'RP?', '2/  2')
+
+    inst.close()
+
+
+def test_broken_getters_are_loaded(matching):
+    # The fixture defines a getter without response and one with a
+    # malformed template, neither prevents the device from being used.
+    inst = open_instrument(matching, 'ASRL1::INSTR')
+
+    assert_instrument_response(inst, '?IDN', 'MATCHING MOCK')
+    assert_instrument_response(inst, 'B?', "{'abc'}")
+
+    inst.close()
+
+
+@pytest.mark.parametrize('resource', RESOURCES)
+def test_setters_with_overlapping_prefixes(resource, matching):
+    inst = open_instrument(matching, resource)
+
+    assert_instrument_response(inst, 'LV5', 'OK')
+    assert_instrument_response(inst, 'LVL 7', 'OK')
+    assert_instrument_response(inst, 'LV?', '5')
+    assert_instrument_response(inst, 'LVL?', '7')
+
+    assert_instrument_response(inst, 'LVL7', 'ERROR')
+    assert_instrument_response(inst, 'LV 5', 'ERROR')
+
+    inst.close()
+
+
+@pytest.mark.parametrize('resource', RESOURCES)
+def test_ambiguous_setters_follow_definition_order(resource, matching):
+    inst = open_instrument(matching, resource)
+
+    # Both A{} and AB{:d} match, A{} is defined first.
+    assert_instrument_response(inst, 'AB5', 'OK')
+    assert_instrument_response(inst, 'A?', 'B5')
+    assert_instrument_response(inst, 'AB?', '0')
+
+    inst.close()
+
+
+@pytest.mark.parametrize('resource', RESOURCES)
+def test_setter_with_escaped_braces(resource, matching):
+    inst = open_instrument(matching, resource)
+
+    assert_instrument_response(inst, 'B}R 5', 'OK')
+    assert_instrument_response(inst, 'BR?', '5')
+
+    inst.close()
+
+
+@pytest.mark.parametrize('resource', RESOURCES)
+def test_getter_after_setter(resource, matching):
+    inst = open_instrument(matching, resource)
+
+    assert_instrument_response(inst, 'R 1', 'OK')
+    assert_instrument_response(inst, 'R?', 'R=1V')
+    assert_instrument_response(inst, 'R 5', 'OK')
+    assert_instrument_response(inst, 'R?', 'R=5V')
+
+    assert_instrument_response(inst, 'R 11', 'RANGE_ERROR')
+    assert_instrument_response(inst, 'R -1', 'RANGE_ERROR')
+    assert_instrument_response(inst, 'R?', 'R=5V')
+
+    inst.close()
+
+
+@pytest.mark.parametrize('resource', RESOURCES)
+def test_cached_responses_are_invalidated(resource, matching):
+    inst = open_instrument(matching, resource)
+    device = matching.visalib.sessions[inst.session].device
+
+    inst.query('R?')
+    device._properties['range'].set_value(3)
+    assert_instrument_response(inst, 'R?', 'R=3V')
+    device._properties['range'].init_value(4)
+    assert_instrument_response(inst, 'R?', 'R=4V')
+
+    device.add_dialogue('D?', 'one')
+    assert_instrument_response(inst, 'D?', 'one')
+    device.add_dialogue('D?', 'two')
+    assert_instrument_response(inst, 'D?', 'two')
+
+    inst.close()
+
+
+@pytest.mark.parametrize('resource', [
+    'ASRL2::INSTR',
+    'GPIB0::9::INSTR',
+    'TCPIP0::localhost:2222::inst0::INSTR',
+    'USB0::0x1111::0x2222::0x2468::0::INSTR',
+])
+def test_queries_added_after_first_match(resource, matching):
+    inst = open_instrument(matching, resource)
+    device = matching.visalib.sessions[inst.session].device
+
+    assert_instrument_response(inst, 'A?', 'ERROR')
+
+    device.add_dialogue('A?', 'one')
+    assert_instrument_response(inst, 'A?', 'one')
+
+    device.add_property('p', '1', ('P?', '{}'), ('P {}', 'OK', 'ERROR'), {})
+    assert_instrument_response(inst, 'P 2', 'OK')
+    assert_instrument_response(inst, 'P?', '2')
+
+    inst.close()